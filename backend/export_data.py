@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Export rooms or games as NDJSON (optionally gzipped) for analytics.
+
+Usage:
+    python export_data.py rooms --since 2024-01-01 --output rooms.ndjson.gz --gzip
+    python export_data.py games --cursor <next_cursor> --limit 100000
+"""
+
+import argparse
+import contextlib
+import sys
+from datetime import datetime
+
+# server.py reports its storage backend on import; keep stdout clean for NDJSON output
+with contextlib.redirect_stdout(sys.stderr):
+    import server
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream rooms or games as NDJSON")
+    parser.add_argument("collection", choices=server.EXPORT_COLLECTIONS)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only documents created at or after this ISO time")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only documents created before this ISO time")
+    parser.add_argument("--cursor", help="Resume from a next_cursor token of an earlier export")
+    parser.add_argument("--fields", help="Comma-separated list of fields to export")
+    parser.add_argument("--limit", type=positive_int, help="Stop after this many documents and print a next_cursor line")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--gzip", action="store_true", help="Write gzip-compressed output")
+    parser.add_argument("--output", help="Output file (defaults to stdout)")
+    args = parser.parse_args()
+
+    try:
+        after = server.decode_export_cursor(args.collection, args.cursor) if args.cursor else None
+    except server.HTTPException as e:
+        parser.error(e.detail)
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()] if args.fields else None
+
+    documents = server.iter_export_documents(args.collection, args.since, args.until, after, fields, args.batch_size)
+    chunks = server.iter_export_ndjson(args.collection, documents, args.limit, args.batch_size)
+    if args.gzip:
+        chunks = server.iter_gzip(chunks)
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,39 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pymongo import MongoClient, ReturnDocument
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Set, Any
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+import asyncio
+import cProfile
+import hmac
+import pstats
+import io
+import base64
+import bisect
 import json
+import mmap
+import zlib
 import os
+import time
 import uuid
 import random
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Restore live rooms before the server starts accepting connections
+    restore_room_snapshot()
+    reconcile_leaderboard()
+    reconcile_task = asyncio.create_task(run_leaderboard_reconciliation())
+    yield
+    reconcile_task.cancel()
+    await drain_and_snapshot()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -29,6 +53,29 @@ try:
     db = client.tictactoe
     games_collection = db.games
     rooms_collection = db.rooms
+    # Rooms created before player_count existed get it backfilled once; the marker
+    # document keeps later starts (and export runs) from rescanning the collection
+    if db.migrations.find_one({"_id": "room_player_count"}) is None:
+        rooms_collection.update_many(
+            {"player_count": {"$exists": False}},
+            [{"$set": {"player_count": {"$size": "$players"}}}]
+        )
+        db.migrations.update_one(
+            {"_id": "room_player_count"},
+            {"$set": {"applied_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    # Room lookups by id back every WebSocket connect/subscribe
+    rooms_collection.create_index("room_id")
+    # Partial index over joinable rooms only, so the lobby stays small however many rooms are finished
+    rooms_collection.create_index(
+        [("created_at", -1), ("room_id", -1)],
+        name="open_rooms",
+        partialFilterExpression={"player_count": {"$lt": 2}}
+    )
+    player_stats_collection = db.player_stats
+    player_stats_collection.create_index("name", unique=True)
+    player_stats_collection.create_index([("wins", -1), ("draws", -1)])
     print("✅ Connected to MongoDB")
 except Exception as e:
     print(f"⚠️  MongoDB not available: {e}")
@@ -36,9 +83,13 @@ except Exception as e:
     # Fallback to in-memory storage
     rooms_collection = None
     games_collection = None
+    player_stats_collection = None
 
-# In-memory storage fallback
+# In-memory storage fallback - room_id -> CompactRoom, plus the append-only insertion order used by exports
 in_memory_rooms = {}
+in_memory_room_order: List[str] = []
+
+MAX_PLAYERS = 2
 
 # Models
 class GameState(BaseModel):
@@ -58,34 +109,150 @@ class AIMove(BaseModel):
     row: int
     col: int
 
+class ProfilingConfig(BaseModel):
+    enabled: bool
+    sample_rate: float = Field(ge=0.0, le=1.0)
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Indexed both ways so a disconnect only touches the rooms that socket subscribed to
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}
+        # Lobby feed subscribers live apart from room ids so no room message can reach them
+        self.lobby: Set[WebSocket] = set()
+        self.draining = False
 
-    async def connect(self, websocket: WebSocket, room_id: str):
+    async def connect(self, websocket: WebSocket, room_id: Optional[str] = None):
         await websocket.accept()
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        self.active_connections[room_id].append(websocket)
+        self.subscriptions[websocket] = set()
+        if room_id is not None:
+            self.subscribe(websocket, room_id)
 
-    def disconnect(self, websocket: WebSocket, room_id: str):
-        if room_id in self.active_connections:
-            if websocket in self.active_connections[room_id]:
-                self.active_connections[room_id].remove(websocket)
-            if not self.active_connections[room_id]:
+    def subscribe(self, websocket: WebSocket, room_id: str):
+        self.active_connections.setdefault(room_id, set()).add(websocket)
+        self.subscriptions.setdefault(websocket, set()).add(room_id)
+
+    def unsubscribe(self, websocket: WebSocket, room_id: str):
+        connections = self.active_connections.get(room_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
                 del self.active_connections[room_id]
+        rooms = self.subscriptions.get(websocket)
+        if rooms is not None:
+            rooms.discard(room_id)
+
+    def disconnect(self, websocket: WebSocket):
+        self.lobby.discard(websocket)
+        for room_id in self.subscriptions.pop(websocket, ()):
+            connections = self.active_connections.get(room_id)
+            if connections is not None:
+                connections.discard(websocket)
+                if not connections:
+                    del self.active_connections[room_id]
 
     async def broadcast_to_room(self, message: str, room_id: str):
         if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
+            for connection in list(self.active_connections[room_id]):
                 try:
                     await connection.send_text(message)
                 except:
                     pass
 
+    async def broadcast_to_lobby(self, message: str):
+        for connection in list(self.lobby):
+            try:
+                await connection.send_text(message)
+            except:
+                pass
+
+    async def drain(self, reconnect_after_ms: int) -> Dict[str, int]:
+        """Ask every client to reconnect, close their sockets and return connection counts per room"""
+        self.draining = True
+        resume = {room_id: len(connections) for room_id, connections in self.active_connections.items()}
+        for connection, rooms in list(self.subscriptions.items()):
+            try:
+                for room_id in rooms:
+                    await connection.send_text(json.dumps({
+                        "type": "server_restarting",
+                        "room_id": room_id,
+                        "reconnect_after_ms": reconnect_after_ms
+                    }))
+                await connection.close(code=1012)  # 1012 = service restart
+            except:
+                pass
+        self.active_connections.clear()
+        self.subscriptions.clear()
+        self.lobby.clear()
+        return resume
+
 manager = ConnectionManager()
 
+# Admin access - endpoints under /api/admin require X-Admin-Token and are disabled when ADMIN_TOKEN is unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# On-demand sampling profiler for AI moves and WebSocket messages
+class RequestProfiler:
+    def __init__(self, enabled: bool, sample_rate: float, buffer_size: int):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.profiles = deque(maxlen=buffer_size)
+        self._active = False
+        self._next_id = 1
+
+    def should_sample(self, forced: bool = False) -> bool:
+        # Only one cProfile profiler can be installed at a time, so overlapping
+        # samples are skipped rather than nested
+        if not self.enabled or self._active:
+            return False
+        return forced or random.random() < self.sample_rate
+
+    def sample(self, kind: str, label: str, forced: bool = False):
+        """Context manager yielding engine counters when sampled, otherwise None"""
+        if self.should_sample(forced):
+            return self._capture(kind, label)
+        return nullcontext()
+
+    @contextmanager
+    def _capture(self, kind: str, label: str):
+        counters = {"nodes_visited": 0, "cutoffs": 0}
+        profile = cProfile.Profile()
+        self._active = True
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield counters
+        finally:
+            profile.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._active = False
+
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(40)
+            self.profiles.append({
+                "id": self._next_id,
+                "kind": kind,
+                "label": label,
+                "captured_at": datetime.now(timezone.utc).isoformat(),
+                "elapsed_ms": round(elapsed_ms, 3),
+                "counters": counters,
+                "stats": stream.getvalue()
+            })
+            self._next_id += 1
+
+profiler = RequestProfiler(
+    enabled=os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes'),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0.01')),
+    buffer_size=int(os.environ.get('PROFILE_BUFFER_SIZE', '50'))
+)
+
 # Game logic
 def create_empty_board():
     return [["-" for _ in range(3)] for _ in range(3)]
@@ -124,7 +291,10 @@ def get_available_moves(board):
     return moves
 
 # AI Logic - Minimax algorithm
-def minimax(board, depth, is_maximizing, alpha=-float('inf'), beta=float('inf')):
+def minimax(board, depth, is_maximizing, alpha=-float('inf'), beta=float('inf'), stats=None):
+    if stats is not None:
+        stats["nodes_visited"] += 1
+
     winner = check_winner(board)
     
     if winner == "O":  # AI wins
@@ -140,11 +310,13 @@ def minimax(board, depth, is_maximizing, alpha=-float('inf'), beta=float('inf'))
             for j in range(3):
                 if board[i][j] == "-":
                     board[i][j] = "O"
-                    eval_score = minimax(board, depth + 1, False, alpha, beta)
+                    eval_score = minimax(board, depth + 1, False, alpha, beta, stats)
                     board[i][j] = "-"
                     max_eval = max(max_eval, eval_score)
                     alpha = max(alpha, eval_score)
                     if beta <= alpha:
+                        if stats is not None:
+                            stats["cutoffs"] += 1
                         break
         return max_eval
     else:
@@ -153,15 +325,17 @@ def minimax(board, depth, is_maximizing, alpha=-float('inf'), beta=float('inf'))
             for j in range(3):
                 if board[i][j] == "-":
                     board[i][j] = "X"
-                    eval_score = minimax(board, depth + 1, True, alpha, beta)
+                    eval_score = minimax(board, depth + 1, True, alpha, beta, stats)
                     board[i][j] = "-"
                     min_eval = min(min_eval, eval_score)
                     beta = min(beta, eval_score)
                     if beta <= alpha:
+                        if stats is not None:
+                            stats["cutoffs"] += 1
                         break
         return min_eval
 
-def get_ai_move(board, difficulty="hard"):
+def get_ai_move(board, difficulty="hard", stats=None):
     available_moves = get_available_moves(board)
     
     if not available_moves:
@@ -177,7 +351,7 @@ def get_ai_move(board, difficulty="hard"):
             best_move = available_moves[0]
             for move in available_moves:
                 board[move[0]][move[1]] = "O"
-                score = minimax(board, 0, False)
+                score = minimax(board, 0, False, stats=stats)
                 board[move[0]][move[1]] = "-"
                 if score > best_score:
                     best_score = score
@@ -191,13 +365,406 @@ def get_ai_move(board, difficulty="hard"):
         best_move = available_moves[0]
         for move in available_moves:
             board[move[0]][move[1]] = "O"
-            score = minimax(board, 0, False)
+            score = minimax(board, 0, False, stats=stats)
             board[move[0]][move[1]] = "-"
             if score > best_score:
                 best_score = score
                 best_move = move
         return best_move
 
+# Compact in-memory room representation - converted to the JSON room shape only at the API boundary
+CELL_SYMBOLS = ("-", "X", "O")
+CELL_CODES = {"-": 0, "X": 1, "O": 2}
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Game state packs into one int: 2 bits per cell for the 18 board bits, then flags and the winner code
+CURRENT_O_BIT = 1 << 18
+GAME_OVER_BIT = 1 << 19
+IS_DRAW_BIT = 1 << 20
+WINNER_SHIFT = 21
+
+def datetime_to_us(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def us_to_datetime(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+def pack_game_state(game_state: dict) -> int:
+    state = 0
+    for i, row in enumerate(game_state["board"]):
+        for j, cell in enumerate(row):
+            state |= CELL_CODES[cell] << (2 * (3 * i + j))
+    if game_state["current_player"] == "O":
+        state |= CURRENT_O_BIT
+    if game_state["game_over"]:
+        state |= GAME_OVER_BIT
+    if game_state["is_draw"]:
+        state |= IS_DRAW_BIT
+    state |= CELL_CODES[game_state["winner"] or "-"] << WINNER_SHIFT
+    return state
+
+def unpack_game_state(state: int) -> dict:
+    winner = CELL_SYMBOLS[(state >> WINNER_SHIFT) & 3]
+    return {
+        "board": [[CELL_SYMBOLS[(state >> (2 * (3 * i + j))) & 3] for j in range(3)] for i in range(3)],
+        "current_player": "O" if state & CURRENT_O_BIT else "X",
+        "game_over": bool(state & GAME_OVER_BIT),
+        "winner": None if winner == "-" else winner,
+        "is_draw": bool(state & IS_DRAW_BIT)
+    }
+
+class PlayerTable:
+    """Interns player names so rooms hold small integer ids instead of strings"""
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, name: str) -> int:
+        player_id = self.ids.get(name)
+        if player_id is None:
+            player_id = len(self.names)
+            self.names.append(name)
+            self.ids[name] = player_id
+        return player_id
+
+player_table = PlayerTable()
+
+class CompactRoom:
+    __slots__ = ("room_id", "player_ids", "state", "created_at_us")
+
+    def __init__(self, room_id: str, player_ids: tuple, state: int, created_at_us: int):
+        self.room_id = room_id
+        self.player_ids = player_ids
+        self.state = state
+        self.created_at_us = created_at_us
+
+    @classmethod
+    def from_dict(cls, room: dict) -> "CompactRoom":
+        return cls(
+            room["room_id"],
+            tuple(player_table.intern(name) for name in room["players"]),
+            pack_game_state(room["game_state"]),
+            datetime_to_us(room["created_at"])
+        )
+
+    @property
+    def players(self) -> List[str]:
+        return [player_table.names[player_id] for player_id in self.player_ids]
+
+    @property
+    def player_count(self) -> int:
+        return len(self.player_ids)
+
+    def to_dict(self) -> dict:
+        return {
+            "room_id": self.room_id,
+            "players": self.players,
+            "player_count": self.player_count,
+            "game_state": unpack_game_state(self.state),
+            "created_at": us_to_datetime(self.created_at_us)
+        }
+
+# Room storage - MongoDB when available, otherwise in-memory
+class OpenRoomIndex:
+    """In-memory counterpart of the open_rooms index: (created_at_us, room_id) keys kept sorted"""
+    def __init__(self):
+        self.keys = []
+
+    def add(self, room: CompactRoom):
+        bisect.insort(self.keys, (room.created_at_us, room.room_id))
+
+    def remove(self, room: CompactRoom):
+        key = (room.created_at_us, room.room_id)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def page(self, limit: int, before: Optional[tuple] = None) -> List[str]:
+        """Room ids newest first, strictly older than the before key"""
+        end = bisect.bisect_left(self.keys, before) if before is not None else len(self.keys)
+        return [room_id for _, room_id in reversed(self.keys[max(0, end - limit):end])]
+
+open_rooms = OpenRoomIndex()
+
+def find_room(room_id: str) -> Optional[dict]:
+    if rooms_collection is not None:
+        return rooms_collection.find_one({"room_id": room_id})
+    room = in_memory_rooms.get(room_id)
+    return room.to_dict() if room is not None else None
+
+def room_exists(room_id: str) -> bool:
+    if rooms_collection is not None:
+        return rooms_collection.find_one({"room_id": room_id}, {"_id": 1}) is not None
+    return room_id in in_memory_rooms
+
+def insert_room(room: dict):
+    if rooms_collection is not None:
+        rooms_collection.insert_one(room)
+    else:
+        compact_room = CompactRoom.from_dict(room)
+        in_memory_rooms[compact_room.room_id] = compact_room
+        in_memory_room_order.append(compact_room.room_id)
+        open_rooms.add(compact_room)
+
+def add_player_to_room(room_id: str, player_name: str) -> Optional[dict]:
+    """Seat a new player if there is room; returns the updated room, or None if nothing changed"""
+    if rooms_collection is not None:
+        return rooms_collection.find_one_and_update(
+            {"room_id": room_id, "player_count": {"$lt": MAX_PLAYERS}, "players": {"$ne": player_name}},
+            {"$push": {"players": player_name}, "$inc": {"player_count": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    room = in_memory_rooms.get(room_id)
+    if room is None or room.player_count >= MAX_PLAYERS:
+        return None
+    # The player table never shrinks, so only intern names that actually get a seat
+    existing_id = player_table.ids.get(player_name)
+    if existing_id is not None and existing_id in room.player_ids:
+        return None
+    room.player_ids += (player_table.intern(player_name),)
+    if room.player_count >= MAX_PLAYERS:
+        open_rooms.remove(room)
+    return room.to_dict()
+
+def save_game_state(room_id: str, game_state: dict):
+    if rooms_collection is not None:
+        rooms_collection.update_one(
+            {"room_id": room_id},
+            {"$set": {"game_state": game_state}}
+        )
+    elif room_id in in_memory_rooms:
+        in_memory_rooms[room_id].state = pack_game_state(game_state)
+
+def encode_lobby_cursor(created_at: datetime, room_id: str) -> str:
+    token = json.dumps({"created_at": created_at.isoformat(), "room_id": room_id})
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+def decode_lobby_cursor(cursor: str) -> tuple:
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at, room_id = datetime.fromisoformat(token["created_at"]), token["room_id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid lobby cursor")
+    # room_id is compared against stored ids (bisect in memory, $lt in Mongo), so it must be a string
+    if not isinstance(room_id, str):
+        raise HTTPException(status_code=400, detail="Invalid lobby cursor")
+    return created_at, room_id
+
+def list_open_rooms(limit: int, before: Optional[tuple] = None) -> List[dict]:
+    """Joinable rooms newest first, using keyset pagination on (created_at, room_id)"""
+    if rooms_collection is not None:
+        query: Dict[str, Any] = {"player_count": {"$lt": MAX_PLAYERS}}
+        if before is not None:
+            created_at, room_id = before
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "room_id": {"$lt": room_id}}
+            ]
+        cursor = rooms_collection.find(
+            query,
+            {"_id": 0, "room_id": 1, "players": 1, "player_count": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("room_id", -1)]).limit(limit)
+        return list(cursor)
+
+    if before is not None:
+        before = (datetime_to_us(before[0]), before[1])
+    rooms = []
+    for room_id in open_rooms.page(limit, before):
+        room = in_memory_rooms[room_id]
+        rooms.append({
+            "room_id": room_id,
+            "players": room.players,
+            "player_count": room.player_count,
+            "created_at": us_to_datetime(room.created_at_us)
+        })
+    return rooms
+
+# Warm restart - in-memory rooms are snapshotted on shutdown and restored on startup
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'room_snapshot.ndjson'))
+SNAPSHOT_VERSION = 2  # Header, then `rooms` room lines, then player stats lines; any other version is ignored
+RECONNECT_AFTER_MS = int(os.environ.get('RECONNECT_AFTER_MS', '1000'))
+
+def write_room_snapshot(resume: Dict[str, int]) -> int:
+    """Write a header line with resume info and counts, then one compact JSON line per room and per player's stats"""
+    rooms = list(in_memory_rooms.values())
+    player_stats = list(in_memory_player_stats.values())
+    tmp_path = SNAPSHOT_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "resume": resume,
+            "rooms": len(rooms),
+            "players": len(player_stats)
+        }, separators=(",", ":")).encode() + b"\n")
+        for room in rooms:
+            f.write(json.dumps(room.to_dict(), separators=(",", ":"), default=export_json_default).encode() + b"\n")
+        for stats in player_stats:
+            f.write(json.dumps(stats, separators=(",", ":")).encode() + b"\n")
+    os.replace(tmp_path, SNAPSHOT_PATH)
+    return len(rooms)
+
+def restore_room_snapshot() -> int:
+    if rooms_collection is not None or not os.path.exists(SNAPSHOT_PATH):
+        return 0
+    if os.path.getsize(SNAPSHOT_PATH) == 0:
+        os.remove(SNAPSHOT_PATH)
+        return 0
+
+    restored = 0
+    restored_players = 0
+    with open(SNAPSHOT_PATH, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header = json.loads(mm.readline())
+        version = header.get("version")
+        if version != SNAPSHOT_VERSION:
+            print(f"⚠️  Ignoring room snapshot with unsupported version {version}")
+            return 0
+        room_count = header["rooms"]
+        for line in iter(mm.readline, b""):
+            if restored >= room_count:
+                stats = json.loads(line)
+                in_memory_player_stats[stats["name"]] = stats
+                restored_players += 1
+                continue
+            room = json.loads(line)
+            room["created_at"] = datetime.fromisoformat(room["created_at"])
+            compact_room = CompactRoom.from_dict(room)
+            in_memory_rooms[compact_room.room_id] = compact_room
+            in_memory_room_order.append(compact_room.room_id)
+            if compact_room.player_count < MAX_PLAYERS:
+                open_rooms.add(compact_room)
+            restored += 1
+
+    # The rooms now live in memory again; a stale snapshot must not be reloaded after a crash
+    os.remove(SNAPSHOT_PATH)
+    print(f"♻️  Restored {restored} rooms and {restored_players} player records from snapshot saved at "
+          f"{header['saved_at']}, {sum(header['resume'].values())} clients expected to reconnect")
+    return restored
+
+async def drain_and_snapshot():
+    if manager.draining:
+        return
+    resume = await manager.drain(RECONNECT_AFTER_MS)
+    await flush_room_actors()
+    if rooms_collection is None:
+        saved = write_room_snapshot(resume)
+        print(f"💾 Saved {saved} rooms to {SNAPSHOT_PATH}")
+
+# Data export - streams rooms/games as NDJSON with a batched cursor. Nothing writes
+# games_collection, so "games" are the rooms whose current game has finished
+EXPORT_COLLECTIONS = ("rooms", "games")
+
+def encode_export_cursor(collection: str, after: str) -> str:
+    token = json.dumps({"collection": collection, "after": after})
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+def decode_export_cursor(collection: str, cursor: str) -> str:
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    if not isinstance(token, dict) or not isinstance(token.get("after"), str) or not token["after"]:
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    if token.get("collection") != collection:
+        raise HTTPException(status_code=400, detail="Export cursor does not match collection")
+    if rooms_collection is not None:
+        if not ObjectId.is_valid(token["after"]):
+            raise HTTPException(status_code=400, detail="Invalid export cursor")
+    elif not token["after"].isdigit() or int(token["after"]) >= len(in_memory_room_order):
+        # In-memory cursors are insertion positions; never silently restart from the beginning
+        raise HTTPException(status_code=400, detail="Export cursor refers to an unknown room")
+    return token["after"]
+
+def export_json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def iter_export_documents(collection: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          after: Optional[str] = None, fields: Optional[List[str]] = None,
+                          batch_size: int = 500):
+    """Yield (cursor_key, document) pairs ordered by insertion, filtered on created_at.
+    The cursor key is the ObjectId in MongoDB and the insertion position in memory"""
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if until is not None and until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+
+    if rooms_collection is not None:
+        query: Dict[str, Any] = {}
+        if collection == "games":
+            query["game_state.game_over"] = True
+        created_at: Dict[str, Any] = {}
+        if since is not None:
+            created_at["$gte"] = since
+        if until is not None:
+            created_at["$lt"] = until
+        if created_at:
+            query["created_at"] = created_at
+        if after is not None:
+            query["_id"] = {"$gt": ObjectId(after)}
+        projection = {field: 1 for field in fields} if fields else None
+
+        cursor = rooms_collection.find(query, projection).sort("_id", 1).batch_size(batch_size)
+        try:
+            for document in cursor:
+                key = str(document["_id"])
+                document["_id"] = key
+                yield key, document
+        finally:
+            cursor.close()
+        return
+
+    # Walk the append-only insertion order by position: no copy of the keys, O(1) resume,
+    # and rooms created while the export runs are simply picked up at the end
+    since_us = datetime_to_us(since) if since is not None else None
+    until_us = datetime_to_us(until) if until is not None else None
+    position = int(after) + 1 if after is not None else 0
+    while position < len(in_memory_room_order):
+        room_id = in_memory_room_order[position]
+        position += 1
+        compact_room = in_memory_rooms.get(room_id)
+        if compact_room is None:
+            continue
+        if collection == "games" and not compact_room.state & GAME_OVER_BIT:
+            continue
+        if since_us is not None and compact_room.created_at_us < since_us:
+            continue
+        if until_us is not None and compact_room.created_at_us >= until_us:
+            continue
+        room = compact_room.to_dict()
+        if fields:
+            room = {field: room[field] for field in fields if field in room}
+        yield str(position - 1), room
+
+def iter_export_ndjson(collection: str, documents, limit: Optional[int] = None, batch_size: int = 500):
+    """Encode documents as NDJSON chunks, ending with a next_cursor line when limit is reached"""
+    chunk = []
+    count = 0
+    last_key = None
+    for key, document in documents:
+        if limit is not None and count >= limit:
+            chunk.append(json.dumps({"next_cursor": encode_export_cursor(collection, last_key)}) + "\n")
+            break
+        chunk.append(json.dumps(document, default=export_json_default) + "\n")
+        count += 1
+        last_key = key
+        if len(chunk) >= batch_size:
+            yield "".join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield "".join(chunk).encode()
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 # API endpoints
 @app.get("/api/health")
 async def health_check():
@@ -217,118 +784,502 @@ async def create_room():
     room_data = {
         "room_id": room_id,
         "players": [],
+        "player_count": 0,
         "game_state": game_state.model_dump(),
         "created_at": datetime.now(timezone.utc)
     }
     
     # Use MongoDB if available, otherwise in-memory storage
-    if rooms_collection is not None:
-        rooms_collection.insert_one(room_data)
-    else:
-        in_memory_rooms[room_id] = room_data
+    insert_room(room_data)
+    
+    await manager.broadcast_to_lobby(json.dumps({
+        "type": "room_opened",
+        "room_id": room_id,
+        "created_at": room_data["created_at"].isoformat()
+    }))
     
     return {"room_id": room_id}
 
+@app.get("/api/rooms/open")
+async def get_open_rooms(limit: int = 20, cursor: Optional[str] = None):
+    limit = max(1, min(limit, 100))
+    before = decode_lobby_cursor(cursor) if cursor else None
+    rooms = list_open_rooms(limit, before)
+    next_cursor = None
+    if len(rooms) == limit:
+        next_cursor = encode_lobby_cursor(rooms[-1]["created_at"], rooms[-1]["room_id"])
+    return {"rooms": rooms, "next_cursor": next_cursor}
+
 @app.get("/api/room/{room_id}")
 async def get_room(room_id: str):
-    if rooms_collection is not None:
-        room = rooms_collection.find_one({"room_id": room_id})
-        if not room:
-            raise HTTPException(status_code=404, detail="Room not found")
+    room = find_room(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if "_id" in room:
         room["_id"] = str(room["_id"])
-        return room
-    else:
-        # Use in-memory storage
-        room = in_memory_rooms.get(room_id)
-        if not room:
-            raise HTTPException(status_code=404, detail="Room not found")
-        return room
+    return room
+
+@app.get("/api/leaderboard")
+async def get_leaderboard(limit: int = 10):
+    limit = max(1, min(limit, LEADERBOARD_SIZE))
+    return leaderboard.ranked[:limit]
+
+@app.get("/api/players/{name}/stats")
+async def player_stats(name: str):
+    stats = get_player_stats(name)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Player not found")
+    return stats
 
 @app.post("/api/ai-move")
-async def make_ai_move(board: List[List[str]], difficulty: str = "hard"):
-    ai_move = get_ai_move(board, difficulty)
+async def make_ai_move(board: List[List[str]], difficulty: str = "hard", x_profile: Optional[str] = Header(None)):
+    with profiler.sample("ai_move", difficulty, forced=x_profile == "1") as stats:
+        ai_move = get_ai_move(board, difficulty, stats)
     if ai_move:
         return {"row": ai_move[0], "col": ai_move[1]}
     return {"error": "No moves available"}
 
+# Player stats - incremented when a game finishes, with a bounded top-K leaderboard kept in memory
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', '100'))
+LEADERBOARD_RECONCILE_SECONDS = float(os.environ.get('LEADERBOARD_RECONCILE_SECONDS', '300'))
+
+# In-memory stats store - name -> {"name", "wins", "losses", "draws"}
+in_memory_player_stats = {}
+
+class Leaderboard:
+    """Top-K players by (wins, draws). Both only ever increase, so offering each updated
+    player keeps the top K exact on a single node; reconciliation picks up other nodes' games"""
+    def __init__(self, size: int):
+        self.size = size
+        self.top: Dict[str, dict] = {}
+        self.ranked: List[dict] = []
+
+    @staticmethod
+    def score(stats: dict) -> tuple:
+        return (stats["wins"], stats["draws"])
+
+    def offer(self, stats: dict):
+        name = stats["name"]
+        if name not in self.top and len(self.top) >= self.size:
+            lowest = min(self.top.values(), key=self.score)
+            if self.score(stats) <= self.score(lowest):
+                return
+            del self.top[lowest["name"]]
+        self.top[name] = stats
+        self.rerank()
+
+    def replace(self, stats_list: List[dict]):
+        self.top = {stats["name"]: stats for stats in stats_list[:self.size]}
+        self.rerank()
+
+    def rerank(self):
+        self.ranked = sorted(self.top.values(), key=lambda stats: (-stats["wins"], -stats["draws"], stats["name"]))
+
+leaderboard = Leaderboard(LEADERBOARD_SIZE)
+
+def increment_player_stat(name: str, field: str) -> dict:
+    if player_stats_collection is not None:
+        return player_stats_collection.find_one_and_update(
+            {"name": name},
+            {"$inc": {field: 1}, "$setOnInsert": {key: 0 for key in ("wins", "losses", "draws") if key != field}},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    stats = in_memory_player_stats.get(name)
+    if stats is None:
+        stats = in_memory_player_stats[name] = {"name": name, "wins": 0, "losses": 0, "draws": 0}
+    stats[field] += 1
+    return dict(stats)
+
+def record_game_result(players: List[str], winner: Optional[str]):
+    """Players are seated in join order: the first plays X, the second plays O"""
+    for symbol, name in zip(("X", "O"), players):
+        if winner is None:
+            field = "draws"
+        else:
+            field = "wins" if winner == symbol else "losses"
+        leaderboard.offer(increment_player_stat(name, field))
+
+def get_player_stats(name: str) -> Optional[dict]:
+    if player_stats_collection is not None:
+        return player_stats_collection.find_one({"name": name}, {"_id": 0})
+    stats = in_memory_player_stats.get(name)
+    return dict(stats) if stats is not None else None
+
+def fetch_leaderboard_top() -> List[dict]:
+    if player_stats_collection is not None:
+        return list(player_stats_collection.find({}, {"_id": 0}).sort([("wins", -1), ("draws", -1)]).limit(LEADERBOARD_SIZE))
+    top = sorted(in_memory_player_stats.values(), key=lambda stats: (-stats["wins"], -stats["draws"]))
+    return [dict(stats) for stats in top[:LEADERBOARD_SIZE]]
+
+def reconcile_leaderboard():
+    leaderboard.replace(fetch_leaderboard_top())
+
+async def run_leaderboard_reconciliation():
+    while True:
+        await asyncio.sleep(LEADERBOARD_RECONCILE_SECONDS)
+        try:
+            if player_stats_collection is not None:
+                # Only the blocking query runs in a thread; the leaderboard is only ever touched on the event loop
+                top = await asyncio.to_thread(fetch_leaderboard_top)
+            else:
+                top = fetch_leaderboard_top()
+            leaderboard.replace(top)
+        except Exception as e:
+            print(f"⚠️  Leaderboard reconciliation failed: {e!r}")
+
+# Room actors - each active room is owned by one task that applies its commands in order
+ROOM_ACTOR_IDLE_SECONDS = float(os.environ.get('ROOM_ACTOR_IDLE_SECONDS', '30'))
+ROOM_ACTOR_MAX_BATCH = int(os.environ.get('ROOM_ACTOR_MAX_BATCH', '64'))
+
+class RoomActor:
+    """Single writer for a room within this process: commands are queued in a mailbox,
+    applied against local state, and each batch is persisted and broadcast once"""
+    def __init__(self, room_id: str):
+        self.room_id = room_id
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        self.room: Optional[dict] = None
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    command = await asyncio.wait_for(self.mailbox.get(), ROOM_ACTOR_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    if self.mailbox.empty():
+                        break  # No await between here and deregistering, so nothing can be enqueued meanwhile
+                    continue
+                # Let the rest of a burst arrive so it lands in the same batch
+                await asyncio.sleep(0)
+                batch = [command]
+                while len(batch) < ROOM_ACTOR_MAX_BATCH and not self.mailbox.empty():
+                    batch.append(self.mailbox.get_nowait())
+                try:
+                    await self.process(batch)
+                except Exception as e:
+                    # Keep the actor alive so the rest of the mailbox is still processed
+                    print(f"⚠️  Room {self.room_id} batch failed: {e!r}")
+                    self.room = None
+                finally:
+                    for _ in batch:
+                        self.mailbox.task_done()
+        finally:
+            if room_actors.get(self.room_id) is self:
+                del room_actors[self.room_id]
+
+    async def process(self, batch: List[tuple]):
+        # Only the synchronous apply/persist section is profiled
+        forced = any(force_profile for _, force_profile in batch)
+        with profiler.sample("room_batch", f"{self.room_id}:{len(batch)} commands", forced=forced):
+            if self.room is None:
+                try:
+                    self.room = find_room(self.room_id)
+                except Exception as e:
+                    print(f"⚠️  Dropped {len(batch)} commands for room {self.room_id}, load failed: {e!r}")
+                    return
+            
+            events = []
+            results = []
+            dirty = False
+            for message, _ in batch:
+                try:
+                    dirty = self.apply(message, events, results) or dirty
+                except Exception as e:
+                    print(f"⚠️  Dropped {message.get('type')} for room {self.room_id}: {e!r}")
+            
+            if dirty:
+                try:
+                    save_game_state(self.room_id, self.room["game_state"])
+                except Exception as e:
+                    # Local state is now ahead of storage: reload on the next batch and don't announce unsaved moves
+                    print(f"⚠️  Failed to persist room {self.room_id}: {e!r}")
+                    self.room = None
+                    return
+            for players, winner in results:
+                try:
+                    record_game_result(players, winner)
+                except Exception as e:
+                    print(f"⚠️  Failed to record result for {players} in room {self.room_id}: {e!r}")
+        
+        # Broadcasts await other tasks, so they stay outside the profiled section
+        for message, channel in events:
+            if channel is None:
+                await manager.broadcast_to_lobby(message)
+            else:
+                await manager.broadcast_to_room(message, channel)
+
+    def apply(self, message: dict, events: List[tuple], results: List[tuple]) -> bool:
+        """Apply one command to local state, queueing its broadcasts and finished games;
+        returns True if game_state changed. Events are (message, room_id), with None for the lobby"""
+        room_id = self.room_id
+        room = self.room
+        
+        if message["type"] == "join_room":
+            # Add player to room
+            if room and len(room["players"]) < MAX_PLAYERS:
+                updated_room = add_player_to_room(room_id, message["player_name"])
+                events.append((json.dumps({
+                    "type": "player_joined",
+                    "room_id": room_id,
+                    "player": message["player_name"]
+                }), room_id))
+                
+                if updated_room:
+                    room["players"] = updated_room["players"]
+                    room["player_count"] = updated_room["player_count"]
+                    if updated_room["player_count"] >= MAX_PLAYERS:
+                        events.append((json.dumps({
+                            "type": "room_filled",
+                            "room_id": room_id
+                        }), None))
+        
+        elif message["type"] == "make_move":
+            # Process move
+            if room:
+                board = room["game_state"]["board"]
+                row, col = message["row"], message["col"]
+                
+                if board[row][col] == "-" and not room["game_state"]["game_over"]:
+                    board[row][col] = room["game_state"]["current_player"]
+                    
+                    winner = check_winner(board)
+                    is_draw = is_board_full(board) and not winner
+                    game_over = winner is not None or is_draw
+                    
+                    next_player = "O" if room["game_state"]["current_player"] == "X" else "X"
+                    
+                    room["game_state"] = {
+                        "board": board,
+                        "current_player": next_player,
+                        "game_over": game_over,
+                        "winner": winner,
+                        "is_draw": is_draw
+                    }
+                    
+                    events.append((json.dumps({
+                        "type": "game_update",
+                        "room_id": room_id,
+                        "game_state": room["game_state"]
+                    }), room_id))
+                    if game_over:
+                        results.append((list(room["players"]), winner))
+                    return True
+        
+        elif message["type"] == "reset_game":
+            # Reset game
+            game_state = {
+                "board": create_empty_board(),
+                "current_player": "X",
+                "game_over": False,
+                "winner": None,
+                "is_draw": False
+            }
+            
+            events.append((json.dumps({
+                "type": "game_reset",
+                "room_id": room_id,
+                "game_state": game_state
+            }), room_id))
+            if room:
+                room["game_state"] = game_state
+                return True
+        
+        return False
+
+room_actors: Dict[str, RoomActor] = {}
+
+def submit_room_command(room_id: str, message: dict, force_profile: bool = False):
+    actor = room_actors.get(room_id)
+    if actor is None:
+        actor = room_actors[room_id] = RoomActor(room_id)
+    actor.mailbox.put_nowait((message, force_profile))
+
+async def flush_room_actors():
+    """Wait until every queued room command has been applied and persisted"""
+    await asyncio.gather(*(actor.mailbox.join() for actor in list(room_actors.values())))
+
+def parse_ws_message(data: str) -> Optional[dict]:
+    """Decode a client frame; returns None unless it is a JSON object with a string type"""
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        return None
+    return message
+
+INVALID_MESSAGE = json.dumps({"type": "error", "detail": "Messages must be JSON objects with a type"})
+
 @app.websocket("/api/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
+    if manager.draining:
+        await websocket.close(code=1012)
+        return
+    if not room_exists(room_id):
+        # Rejecting the handshake keeps unknown ids from spawning room actors
+        await websocket.close(code=4404)
+        return
     await manager.connect(websocket, room_id)
+    force_profile = websocket.headers.get("x-profile") == "1"
+    try:
+        while True:
+            data = await websocket.receive_text()
+            message = parse_ws_message(data)
+            if message is None:
+                await websocket.send_text(INVALID_MESSAGE)
+                continue
+            
+            submit_room_command(room_id, message, force_profile)
+    
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
+
+@app.websocket("/api/lobby/ws")
+async def lobby_websocket_endpoint(websocket: WebSocket):
+    """Push feed of room_opened / room_filled events"""
+    if manager.draining:
+        await websocket.close(code=1012)
+        return
+    await manager.connect(websocket)
+    manager.lobby.add(websocket)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
+
+MAX_SUBSCRIPTIONS = int(os.environ.get('MAX_SUBSCRIPTIONS', '1000'))
+
+@app.websocket("/api/ws")
+async def multiplexed_websocket_endpoint(websocket: WebSocket):
+    """One connection, many rooms: every message carries the room_id it applies to"""
+    if manager.draining:
+        await websocket.close(code=1012)
+        return
+    await manager.connect(websocket)
+    force_profile = websocket.headers.get("x-profile") == "1"
     try:
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = parse_ws_message(data)
+            if message is None:
+                await websocket.send_text(INVALID_MESSAGE)
+                continue
+            room_id = message.get("room_id")
+            if not room_id or not isinstance(room_id, str):
+                await websocket.send_text(json.dumps({"type": "error", "detail": "room_id is required"}))
+                continue
             
-            if message["type"] == "join_room":
-                # Add player to room
-                room = rooms_collection.find_one({"room_id": room_id})
-                if room and len(room["players"]) < 2:
-                    rooms_collection.update_one(
-                        {"room_id": room_id},
-                        {"$addToSet": {"players": message["player_name"]}}
-                    )
-                    await manager.broadcast_to_room(json.dumps({
-                        "type": "player_joined",
-                        "player": message["player_name"]
-                    }), room_id)
+            if message["type"] == "subscribe":
+                if len(manager.subscriptions[websocket]) >= MAX_SUBSCRIPTIONS:
+                    await websocket.send_text(json.dumps({
+                        "type": "error",
+                        "room_id": room_id,
+                        "detail": "Subscription limit reached"
+                    }))
+                    continue
+                if not room_exists(room_id):
+                    await websocket.send_text(json.dumps({
+                        "type": "error",
+                        "room_id": room_id,
+                        "detail": "Room not found"
+                    }))
+                    continue
+                manager.subscribe(websocket, room_id)
+                await websocket.send_text(json.dumps({"type": "subscribed", "room_id": room_id}))
             
-            elif message["type"] == "make_move":
-                # Process move
-                room = rooms_collection.find_one({"room_id": room_id})
-                if room:
-                    board = room["game_state"]["board"]
-                    row, col = message["row"], message["col"]
-                    
-                    if board[row][col] == "-" and not room["game_state"]["game_over"]:
-                        board[row][col] = room["game_state"]["current_player"]
-                        
-                        winner = check_winner(board)
-                        is_draw = is_board_full(board) and not winner
-                        game_over = winner is not None or is_draw
-                        
-                        next_player = "O" if room["game_state"]["current_player"] == "X" else "X"
-                        
-                        updated_state = {
-                            "board": board,
-                            "current_player": next_player,
-                            "game_over": game_over,
-                            "winner": winner,
-                            "is_draw": is_draw
-                        }
-                        
-                        rooms_collection.update_one(
-                            {"room_id": room_id},
-                            {"$set": {"game_state": updated_state}}
-                        )
-                        
-                        await manager.broadcast_to_room(json.dumps({
-                            "type": "game_update",
-                            "game_state": updated_state
-                        }), room_id)
+            elif message["type"] == "unsubscribe":
+                manager.unsubscribe(websocket, room_id)
+                await websocket.send_text(json.dumps({"type": "unsubscribed", "room_id": room_id}))
             
-            elif message["type"] == "reset_game":
-                # Reset game
-                game_state = {
-                    "board": create_empty_board(),
-                    "current_player": "X",
-                    "game_over": False,
-                    "winner": None,
-                    "is_draw": False
-                }
-                
-                rooms_collection.update_one(
-                    {"room_id": room_id},
-                    {"$set": {"game_state": game_state}}
-                )
-                
-                await manager.broadcast_to_room(json.dumps({
-                    "type": "game_reset",
-                    "game_state": game_state
-                }), room_id)
+            elif room_id not in manager.subscriptions[websocket]:
+                # Subscribing checks the room exists and counts against MAX_SUBSCRIPTIONS,
+                # so commands are only accepted for subscribed rooms
+                await websocket.send_text(json.dumps({
+                    "type": "error",
+                    "room_id": room_id,
+                    "detail": "Not subscribed to room"
+                }))
+            
+            else:
+                submit_room_command(room_id, message, force_profile)
     
     except WebSocketDisconnect:
-        manager.disconnect(websocket, room_id)
+        pass
+    finally:
+        # Runs on any exit so the socket never lingers in the subscription indexes
+        manager.disconnect(websocket)
+
+@app.get("/api/admin/export/{collection}", dependencies=[Depends(require_admin)])
+def export_collection(collection: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      cursor: Optional[str] = None, fields: Optional[str] = None, limit: Optional[int] = Query(None, ge=1),
+                      format: str = "ndjson", batch_size: int = 500):
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    if format not in ("ndjson", "gzip"):
+        raise HTTPException(status_code=400, detail="Format must be ndjson or gzip")
+
+    after = decode_export_cursor(collection, cursor) if cursor else None
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    batch_size = max(1, min(batch_size, 5000))
+
+    # Sync generators are iterated in the threadpool, so the blocking cursor never holds the event loop
+    documents = iter_export_documents(collection, since, until, after, field_list, batch_size)
+    chunks = iter_export_ndjson(collection, documents, limit, batch_size)
+    if format == "gzip":
+        return StreamingResponse(
+            iter_gzip(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{collection}.ndjson.gz"'}
+        )
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+@app.get("/api/admin/profiling", dependencies=[Depends(require_admin)])
+async def get_profiling_config():
+    return {"enabled": profiler.enabled, "sample_rate": profiler.sample_rate}
+
+@app.put("/api/admin/profiling", dependencies=[Depends(require_admin)])
+async def set_profiling_config(config: ProfilingConfig):
+    profiler.enabled = config.enabled
+    profiler.sample_rate = config.sample_rate
+    return {"enabled": profiler.enabled, "sample_rate": profiler.sample_rate}
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return [
+        {key: value for key, value in profile.items() if key != "stats"}
+        for profile in profiler.profiles
+    ]
+
+@app.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int):
+    for profile in profiler.profiles:
+        if profile["id"] == profile_id:
+            header = (
+                f"# {profile['kind']} {profile['label']} at {profile['captured_at']}\n"
+                f"# elapsed_ms={profile['elapsed_ms']} "
+                f"nodes_visited={profile['counters']['nodes_visited']} "
+                f"cutoffs={profile['counters']['cutoffs']}\n\n"
+            )
+            return PlainTextResponse(
+                header + profile["stats"],
+                headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.txt"'}
+            )
+    raise HTTPException(status_code=404, detail="Profile not found")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+
+    class DrainingServer(uvicorn.Server):
+        async def shutdown(self, sockets=None):
+            # Drain our own clients first so they get a reconnect hint before uvicorn closes the sockets
+            await drain_and_snapshot()
+            await super().shutdown(sockets)
+
+    DrainingServer(uvicorn.Config(app, host="0.0.0.0", port=8001)).run()
\ No newline at end of file
@@ -9,12 +9,15 @@ import json
 import asyncio
 import websockets
 import time
+import os
 import sys
 from typing import Dict, List, Any
 
 # Configuration
 BACKEND_URL = "http://localhost:8001"
 WS_URL = "ws://localhost:8001"
+# Admin endpoints are only served when the backend runs with ADMIN_TOKEN set
+ADMIN_HEADERS = {"X-Admin-Token": os.environ.get("ADMIN_TOKEN", "")}
 
 class TicTacToeBackendTester:
     def __init__(self):
@@ -108,6 +111,36 @@ class TicTacToeBackendTester:
             self.log_test("Get Room (Invalid)", False, f"Request failed: {str(e)}")
             return False
 
+    def test_open_rooms_listing(self):
+        """Test that a new room shows up first in the open-room lobby and pages with a cursor"""
+        try:
+            room_id = requests.post(f"{BACKEND_URL}/api/create-room", timeout=5).json()["room_id"]
+            response = requests.get(f"{BACKEND_URL}/api/rooms/open", params={"limit": 1}, timeout=5)
+            if response.status_code != 200:
+                self.log_test("Open Rooms Listing", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+            data = response.json()
+            if not data["rooms"] or data["rooms"][0]["room_id"] != room_id or not data["next_cursor"]:
+                self.log_test("Open Rooms Listing", False, f"Newest room not listed first: {data}")
+                return False
+                
+            response = requests.get(
+                f"{BACKEND_URL}/api/rooms/open",
+                params={"limit": 1, "cursor": data["next_cursor"]},
+                timeout=5
+            )
+            next_page = response.json()["rooms"]
+            if all(room["room_id"] != room_id for room in next_page):
+                self.log_test("Open Rooms Listing", True, f"Room {room_id} listed and next page continues after it")
+                return True
+            else:
+                self.log_test("Open Rooms Listing", False, f"Next page repeated the room: {next_page}")
+                return False
+        except Exception as e:
+            self.log_test("Open Rooms Listing", False, f"Request failed: {str(e)}")
+            return False
+
     def test_ai_move_easy(self):
         """Test AI move with easy difficulty"""
         empty_board = [["-", "-", "-"], ["-", "-", "-"], ["-", "-", "-"]]
@@ -340,6 +373,106 @@ class TicTacToeBackendTester:
             self.log_test("WebSocket Game Reset", False, f"Reset test failed: {str(e)}")
             return False
 
+    async def test_websocket_move_burst(self):
+        """Test that a burst of moves on one room is applied in order"""
+        if not self.room_ids:
+            self.log_test("WebSocket Move Burst", False, "No room IDs available for testing")
+            return False
+            
+        try:
+            room_id = self.room_ids[0]
+            uri = f"{WS_URL}/api/ws/{room_id}"
+            
+            async with websockets.connect(uri, timeout=10) as websocket:
+                await websocket.send(json.dumps({"type": "reset_game"}))
+                await asyncio.wait_for(websocket.recv(), timeout=5)  # Consume reset
+                
+                moves = [(0, 0), (1, 1), (2, 2)]
+                for row, col in moves:
+                    await websocket.send(json.dumps({"type": "make_move", "row": row, "col": col}))
+                
+                players = []
+                for row, col in moves:
+                    data = json.loads(await asyncio.wait_for(websocket.recv(), timeout=5))
+                    players.append(data["game_state"]["board"][row][col])
+                
+                if players == ["X", "O", "X"]:
+                    self.log_test("WebSocket Move Burst", True, "Burst of moves applied in order")
+                    return True
+                else:
+                    self.log_test("WebSocket Move Burst", False, f"Moves applied out of order: {players}")
+                    return False
+                    
+        except Exception as e:
+            self.log_test("WebSocket Move Burst", False, f"Burst test failed: {str(e)}")
+            return False
+
+    async def test_player_stats(self):
+        """Test that finishing a game updates both players' stats"""
+        try:
+            room_id = requests.post(f"{BACKEND_URL}/api/create-room", timeout=5).json()["room_id"]
+            suffix = str(int(time.time() * 1000))
+            winner_name, loser_name = f"Winner{suffix}", f"Loser{suffix}"
+            uri = f"{WS_URL}/api/ws/{room_id}"
+            
+            async with websockets.connect(uri, timeout=10) as websocket:
+                for name in (winner_name, loser_name):
+                    await websocket.send(json.dumps({"type": "join_room", "player_name": name}))
+                    await asyncio.wait_for(websocket.recv(), timeout=5)
+                
+                # X (first player) completes the top row
+                moves = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+                for row, col in moves:
+                    await websocket.send(json.dumps({"type": "make_move", "row": row, "col": col}))
+                for _ in moves:
+                    await asyncio.wait_for(websocket.recv(), timeout=5)
+            
+            winner_stats = requests.get(f"{BACKEND_URL}/api/players/{winner_name}/stats", timeout=5).json()
+            loser_stats = requests.get(f"{BACKEND_URL}/api/players/{loser_name}/stats", timeout=5).json()
+            leaderboard = requests.get(f"{BACKEND_URL}/api/leaderboard", timeout=5)
+            if winner_stats.get("wins") == 1 and loser_stats.get("losses") == 1 and leaderboard.status_code == 200:
+                self.log_test("Player Stats", True, f"Stats recorded: {winner_stats}, {loser_stats}")
+                return True
+            else:
+                self.log_test("Player Stats", False, f"Unexpected stats: {winner_stats}, {loser_stats}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Player Stats", False, f"Stats test failed: {str(e)}")
+            return False
+
+    async def test_multiplexed_websocket(self):
+        """Test subscribing to several rooms over one WebSocket"""
+        if len(self.room_ids) < 2:
+            self.log_test("Multiplexed WebSocket", False, "Need two room IDs for testing")
+            return False
+            
+        try:
+            uri = f"{WS_URL}/api/ws"
+            
+            async with websockets.connect(uri, timeout=10) as websocket:
+                for room_id in self.room_ids[:2]:
+                    await websocket.send(json.dumps({"type": "subscribe", "room_id": room_id}))
+                    data = json.loads(await asyncio.wait_for(websocket.recv(), timeout=5))
+                    if data != {"type": "subscribed", "room_id": room_id}:
+                        self.log_test("Multiplexed WebSocket", False, f"Unexpected subscribe response: {data}")
+                        return False
+                
+                # Commands are routed by room_id and broadcasts come back tagged with it
+                target_room = self.room_ids[1]
+                await websocket.send(json.dumps({"type": "reset_game", "room_id": target_room}))
+                data = json.loads(await asyncio.wait_for(websocket.recv(), timeout=5))
+                if data.get("type") == "game_reset" and data.get("room_id") == target_room:
+                    self.log_test("Multiplexed WebSocket", True, "Subscribed to two rooms and received tagged update")
+                    return True
+                else:
+                    self.log_test("Multiplexed WebSocket", False, f"Unexpected response: {data}")
+                    return False
+                    
+        except Exception as e:
+            self.log_test("Multiplexed WebSocket", False, f"Multiplexed test failed: {str(e)}")
+            return False
+
     def test_database_connection(self):
         """Test MongoDB connection by creating and retrieving a room"""
         try:
@@ -368,6 +501,118 @@ class TicTacToeBackendTester:
             self.log_test("Database Connection", False, f"Database test failed: {str(e)}")
             return False
 
+    def test_export_rooms(self):
+        """Test NDJSON room export with limit and resume cursor"""
+        try:
+            response = requests.get(f"{BACKEND_URL}/api/admin/export/rooms", params={"limit": 1}, headers=ADMIN_HEADERS, timeout=10)
+            if response.status_code != 200:
+                self.log_test("Export Rooms", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+
+            lines = [json.loads(line) for line in response.text.splitlines() if line]
+            if len(lines) != 2 or "room_id" not in lines[0] or "next_cursor" not in lines[1]:
+                self.log_test("Export Rooms", False, f"Unexpected export page: {lines}")
+                return False
+
+            response = requests.get(
+                f"{BACKEND_URL}/api/admin/export/rooms",
+                params={"cursor": lines[1]["next_cursor"], "fields": "room_id"},
+                headers=ADMIN_HEADERS,
+                timeout=10
+            )
+            resumed = [json.loads(line) for line in response.text.splitlines() if line]
+            if resumed and all(doc.get("room_id") != lines[0]["room_id"] for doc in resumed):
+                self.log_test("Export Rooms", True, f"Exported and resumed {len(resumed)} more rooms")
+                return True
+            else:
+                self.log_test("Export Rooms", False, f"Resume did not continue after cursor: {resumed}")
+                return False
+        except Exception as e:
+            self.log_test("Export Rooms", False, f"Export test failed: {str(e)}")
+            return False
+
+    def test_snapshot_round_trip(self):
+        """Test that a warm-restart snapshot restores rooms, players, stats and the open-room index (in-process)"""
+        import tempfile
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        import server
+        
+        saved_state = (server.rooms_collection, server.player_stats_collection, server.SNAPSHOT_PATH,
+                       dict(server.in_memory_rooms), list(server.open_rooms.keys),
+                       dict(server.in_memory_player_stats), server.leaderboard,
+                       list(server.in_memory_room_order))
+        try:
+            # Snapshots only cover in-memory storage; never touch a live MongoDB from this test
+            server.rooms_collection = None
+            server.player_stats_collection = None
+            server.leaderboard = server.Leaderboard(server.LEADERBOARD_SIZE)
+            server.SNAPSHOT_PATH = os.path.join(tempfile.mkdtemp(), "room_snapshot.ndjson")
+            server.in_memory_rooms.clear()
+            server.in_memory_room_order.clear()
+            server.open_rooms.keys.clear()
+            server.in_memory_player_stats.clear()
+            
+            game_state = {
+                "board": [["X", "-", "-"], ["-", "O", "-"], ["-", "-", "-"]],
+                "current_player": "X",
+                "game_over": False,
+                "winner": None,
+                "is_draw": False
+            }
+            for room_id, players in (("snapfull", ["Alice", "Bob"]), ("snapopen", ["Carol"])):
+                server.insert_room({
+                    "room_id": room_id,
+                    "players": [],
+                    "player_count": 0,
+                    "game_state": game_state,
+                    "created_at": server.datetime.now(server.timezone.utc)
+                })
+                for name in players:
+                    server.add_player_to_room(room_id, name)
+            expected = {room_id: server.find_room(room_id) for room_id in server.in_memory_rooms}
+            server.record_game_result(["Alice", "Bob"], "X")
+            expected_stats = {name: dict(stats) for name, stats in server.in_memory_player_stats.items()}
+            if expected_stats != {
+                "Alice": {"name": "Alice", "wins": 1, "losses": 0, "draws": 0},
+                "Bob": {"name": "Bob", "wins": 0, "losses": 1, "draws": 0}
+            }:
+                self.log_test("Snapshot Round Trip", False, f"Game result not recorded in memory: {expected_stats}")
+                return False
+            
+            server.write_room_snapshot({"snapfull": 2, "snapopen": 1})
+            with open(server.SNAPSHOT_PATH, "rb") as f:
+                header = json.loads(f.readline())
+            
+            server.in_memory_rooms.clear()
+            server.in_memory_room_order.clear()
+            server.open_rooms.keys.clear()
+            server.in_memory_player_stats.clear()
+            restored = server.restore_room_snapshot()
+            
+            rooms_match = {room_id: server.find_room(room_id) for room_id in server.in_memory_rooms} == expected
+            open_ids = server.open_rooms.page(10)
+            stats_match = server.in_memory_player_stats == expected_stats
+            if (restored == 2 and rooms_match and stats_match and open_ids == ["snapopen"]
+                    and header["resume"] == {"snapfull": 2, "snapopen": 1}
+                    and not os.path.exists(server.SNAPSHOT_PATH)):
+                self.log_test("Snapshot Round Trip", True, "Rooms, players, stats, open index and resume info restored")
+                return True
+            else:
+                self.log_test("Snapshot Round Trip", False, f"restored={restored} match={rooms_match} stats={stats_match} open={open_ids} header={header}")
+                return False
+        except Exception as e:
+            self.log_test("Snapshot Round Trip", False, f"Snapshot test failed: {str(e)}")
+            return False
+        finally:
+            server.rooms_collection, server.player_stats_collection, server.SNAPSHOT_PATH = saved_state[:3]
+            server.in_memory_rooms.clear()
+            server.in_memory_rooms.update(saved_state[3])
+            server.open_rooms.keys[:] = saved_state[4]
+            server.in_memory_player_stats.clear()
+            server.in_memory_player_stats.update(saved_state[5])
+            server.leaderboard = saved_state[6]
+            server.in_memory_room_order[:] = saved_state[7]
+
     def test_error_handling(self):
         """Test various error conditions"""
         tests_passed = 0
@@ -404,6 +649,56 @@ class TicTacToeBackendTester:
             self.log_test("Error Handling", False, f"Only passed {tests_passed}/{total_tests} error handling tests")
             return False
 
+    def test_profiling_sampled_ai_move(self):
+        """Test forced profiling of an AI move and profile download"""
+        try:
+            response = requests.put(
+                f"{BACKEND_URL}/api/admin/profiling",
+                json={"enabled": True, "sample_rate": 0.0},
+                headers=ADMIN_HEADERS,
+                timeout=5
+            )
+            if response.status_code != 200:
+                self.log_test("Profiling Sampled AI Move", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+
+            empty_board = [["-", "-", "-"], ["-", "-", "-"], ["-", "-", "-"]]
+            requests.post(
+                f"{BACKEND_URL}/api/ai-move",
+                json=empty_board,
+                params={"difficulty": "hard"},
+                headers={"X-Profile": "1"},
+                timeout=10
+            )
+
+            profiles = requests.get(f"{BACKEND_URL}/api/admin/profiles", headers=ADMIN_HEADERS, timeout=5).json()
+            ai_profiles = [p for p in profiles if p["kind"] == "ai_move"]
+            if not ai_profiles or ai_profiles[-1]["counters"]["nodes_visited"] == 0:
+                self.log_test("Profiling Sampled AI Move", False, f"No AI move profile captured: {profiles}")
+                return False
+
+            profile_id = ai_profiles[-1]["id"]
+            response = requests.get(f"{BACKEND_URL}/api/admin/profiles/{profile_id}", headers=ADMIN_HEADERS, timeout=5)
+            if response.status_code == 200 and "minimax" in response.text:
+                self.log_test("Profiling Sampled AI Move", True, f"Profile {profile_id} captured with counters {ai_profiles[-1]['counters']}")
+                return True
+            else:
+                self.log_test("Profiling Sampled AI Move", False, f"Profile download failed: HTTP {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Profiling Sampled AI Move", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            try:
+                requests.put(
+                    f"{BACKEND_URL}/api/admin/profiling",
+                    json={"enabled": False, "sample_rate": 0.0},
+                    headers=ADMIN_HEADERS,
+                    timeout=5
+                )
+            except:
+                pass
+
     async def run_all_tests(self):
         """Run all backend tests"""
         print("🚀 Starting Comprehensive Tic Tac Toe Backend Testing")
@@ -420,6 +715,7 @@ class TicTacToeBackendTester:
         self.test_create_room()  # Create multiple rooms
         self.test_get_room_valid()
         self.test_get_room_invalid()
+        self.test_open_rooms_listing()
         
         # AI functionality tests
         print("🤖 Testing AI Functionality...")
@@ -429,15 +725,27 @@ class TicTacToeBackendTester:
         self.test_ai_blocking_move()
         self.test_ai_full_board()
         
+        # Profiling tests
+        print("⏱️ Testing Profiling...")
+        self.test_profiling_sampled_ai_move()
+        
         # WebSocket tests
         print("🔌 Testing WebSocket Functionality...")
         await self.test_websocket_connection()
         await self.test_websocket_game_move()
         await self.test_websocket_game_reset()
+        await self.test_websocket_move_burst()
+        await self.test_player_stats()
+        await self.test_multiplexed_websocket()
         
         # Database tests
         print("🗄️ Testing Database Integration...")
         self.test_database_connection()
+        self.test_export_rooms()
+        
+        # Warm restart tests
+        print("♻️ Testing Warm Restart...")
+        self.test_snapshot_round_trip()
         
         # Error handling tests
         print("⚠️ Testing Error Handling...")
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import GameBoard from './GameBoard';
 import axios from 'axios';
 
@@ -22,9 +22,15 @@ const MultiPlayerGame = ({ playerName, onBackToMenu }) => {
   const [connectionStatus, setConnectionStatus] = useState('disconnected');
   const [isCreatingRoom, setIsCreatingRoom] = useState(false);
   const [playerSymbol, setPlayerSymbol] = useState(null);
+  const socketRef = useRef(null);
+  const reconnectTimerRef = useRef(null);
+  const stopReconnectRef = useRef(false);
 
   const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
   const WS_URL = BACKEND_URL.replace('http', 'ws');
+  const RECONNECT_BASE_MS = 1000;
+  const RECONNECT_MAX_MS = 30000;
+  const MAX_RECONNECT_ATTEMPTS = 10;
 
   useEffect(() => {
     return () => {
@@ -34,6 +40,39 @@ const MultiPlayerGame = ({ playerName, onBackToMenu }) => {
     };
   }, [ws]);
 
+  useEffect(() => {
+    // On unmount, stop pending reconnects and close a socket that may still be connecting
+    return () => {
+      cancelReconnect();
+      if (socketRef.current) {
+        // Detach handlers so a late close event doesn't update an unmounted component
+        socketRef.current.onclose = null;
+        socketRef.current.onerror = null;
+        socketRef.current.close();
+      }
+    };
+  }, []);
+
+  const cancelReconnect = () => {
+    stopReconnectRef.current = true;
+    clearTimeout(reconnectTimerRef.current);
+    reconnectTimerRef.current = null;
+  };
+
+  const scheduleReconnect = (targetRoomId, attempt, delay) => {
+    if (stopReconnectRef.current) {
+      setConnectionStatus('disconnected');
+      return;
+    }
+    if (attempt > MAX_RECONNECT_ATTEMPTS) {
+      setConnectionStatus('disconnected');
+      alert('Lost connection to the server. Please rejoin the room.');
+      return;
+    }
+    setConnectionStatus('reconnecting');
+    reconnectTimerRef.current = setTimeout(() => joinRoom(targetRoomId, attempt), delay);
+  };
+
   const createRoom = async () => {
     try {
       setIsCreatingRoom(true);
@@ -49,15 +88,23 @@ const MultiPlayerGame = ({ playerName, onBackToMenu }) => {
     }
   };
 
-  const joinRoom = (targetRoomId = roomInputValue) => {
+  // reconnectAttempt > 0 means we are rejoining after a server restart
+  const joinRoom = (targetRoomId = roomInputValue, reconnectAttempt = 0) => {
     if (!targetRoomId.trim()) {
       alert('Please enter a room ID');
       return;
     }
 
+    if (reconnectAttempt === 0) {
+      stopReconnectRef.current = false;
+    }
     const wsConnection = new WebSocket(`${WS_URL}/api/ws/${targetRoomId}`);
+    socketRef.current = wsConnection;
+    let reconnectDelay = RECONNECT_BASE_MS;
+    let opened = false;
     
     wsConnection.onopen = () => {
+      opened = true;
       setConnectionStatus('connected');
       setWs(wsConnection);
       setRoomId(targetRoomId);
@@ -99,17 +146,35 @@ const MultiPlayerGame = ({ playerName, onBackToMenu }) => {
           setGameState(message.game_state);
           break;
 
+        case 'server_restarting':
+          // The server closes the socket with code 1012 right after this message
+          reconnectDelay = message.reconnect_after_ms;
+          break;
+
         default:
           console.log('Unknown message type:', message.type);
       }
     };
 
-    wsConnection.onclose = () => {
-      setConnectionStatus('disconnected');
+    wsConnection.onclose = (event) => {
       setWs(null);
+      if (event.code === 1012) {
+        // Service restart - rejoin the same room once the server is back
+        scheduleReconnect(targetRoomId, 1, reconnectDelay);
+      } else if (reconnectAttempt > 0 && !opened) {
+        // Server not back yet - keep retrying with exponential backoff
+        const delay = Math.min(RECONNECT_BASE_MS * 2 ** reconnectAttempt, RECONNECT_MAX_MS);
+        scheduleReconnect(targetRoomId, reconnectAttempt + 1, delay);
+      } else {
+        setConnectionStatus('disconnected');
+      }
     };
 
     wsConnection.onerror = (error) => {
+      if (reconnectAttempt > 0) {
+        // Expected while the server restarts; onclose schedules the next attempt
+        return;
+      }
       console.error('WebSocket error:', error);
       setConnectionStatus('error');
       alert('Failed to connect to room. Please check the room ID and try again.');
@@ -142,8 +207,9 @@ const MultiPlayerGame = ({ playerName, onBackToMenu }) => {
   };
 
   const leaveRoom = () => {
-    if (ws) {
-      ws.close();
+    cancelReconnect();
+    if (socketRef.current) {
+      socketRef.current.close();
     }
     setIsInRoom(false);
     setRoomId('');
@@ -250,7 +316,9 @@ const MultiPlayerGame = ({ playerName, onBackToMenu }) => {
               <span className={`h-2 w-2 rounded-full ${
                 connectionStatus === 'connected' ? 'bg-green-500' : 'bg-red-500'
               }`}></span>
-              <span>{connectionStatus === 'connected' ? 'Connected' : 'Disconnected'}</span>
+              <span>
+                {connectionStatus === 'connected' ? 'Connected' : connectionStatus === 'reconnecting' ? 'Reconnecting...' : 'Disconnected'}
+              </span>
             </div>
           </div>
           <div className="flex space-x-2">